@@ -0,0 +1,163 @@
+# This module contains a streaming counterpart to the exact selectors in selection.py.
+# Those need the whole collection in memory with random access; a sketch instead sees each value once, in any order,
+# and answers approximate rank and quantile queries from a fixed amount of memory.
+#
+# KLLSketch implements the KLL sketch (Karnin, Lang & Liberty, 2016).
+# Values are kept in a hierarchy of "compactors". A value in compactor h stands for 2^h values of the stream.
+# When a compactor fills up, it is sorted, and every other value (starting from a random offset) is promoted to compactor h + 1;
+# the rest are discarded. Lower compactors get geometrically smaller capacities (by a factor of 2/3), so the total size stays O(k).
+#
+# With k values of capacity in the top compactor, the rank error is O(n/k) with high probability;
+# for k=200, estimated ranks are typically within 1% of n.
+#
+# For more information, read https://arxiv.org/abs/1603.05346.
+import math
+import random
+
+
+class KLLSketch:
+    _CAPACITY_DECAY = 2 / 3
+
+    def __init__(self, iterable=None, k=200, seed=None):
+        """
+        * iterable: if non-empty, updates the sketch with all of its values.
+        * k: the capacity of the top compactor. Memory is O(k); the rank error is O(1/k).
+        * seed: seeds the random offsets used when compacting, for reproducible sketches.
+        """
+        if k < 2:
+            raise ValueError('k must be at least 2; was {0}'.format(k))
+
+        self._k = k
+        self._random = random.Random(seed)
+        self._compactors = []
+        self._max_size = 0
+        self._size = 0
+        self._count = 0
+        self._grow()
+
+        if iterable:
+            self.update_many(iterable)
+
+    def __repr__(self) -> str:
+        return '{0}(k={1}, count={2}, retained={3})'.format(type(self).__name__, self._k, self._count, self._size)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of values the sketch has seen.
+        """
+        return self._count
+
+    def update(self, value) -> None:
+        """
+        Adds value to the sketch.
+
+        Amortized O(log k) time.
+        """
+        self._compactors[0].append(value)
+        self._size += 1
+        self._count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, iterable) -> None:
+        """
+        Adds every value of iterable to the sketch.
+        """
+        for value in iterable:
+            self.update(value)
+
+    def merge(self, other: 'KLLSketch') -> None:
+        """
+        Adds all values seen by other into this sketch.
+        The merged sketch has the same error guarantee as one that saw both streams.
+        """
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for compactor, other_compactor in zip(self._compactors, other._compactors):
+            compactor.extend(other_compactor)
+        self._size = sum(len(c) for c in self._compactors)
+        self._count += other._count
+
+        while self._size >= self._max_size:
+            self._compress()
+
+    def rank(self, value) -> int:
+        """
+        Returns an estimate of the number of values seen that are less than or equal to value.
+        """
+        return sum(2 ** h for h, compactor in enumerate(self._compactors) for item in compactor if item <= value)
+
+    def quantile(self, q: float):
+        """
+        Returns an estimate of the q-quantile of the values seen, i.e., the smallest retained value whose estimated rank is at least q * n.
+        Raises ValueError if q is not in [0, 1] or if the sketch is empty.
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs) -> list:
+        """
+        Returns quantile(q) for each q in qs, in the same order as qs, sorting the retained values only once.
+        """
+        qs = list(qs)
+        if not self._count:
+            raise ValueError('cannot compute quantiles of an empty sketch')
+        if any(not 0 <= q <= 1 for q in qs):
+            raise ValueError('quantiles must be in [0, 1]; were {0}'.format(qs))
+
+        weighted = sorted(((item, 2 ** h) for h, compactor in enumerate(self._compactors) for item in compactor),
+                          key=lambda pair: pair[0])
+        total = sum(weight for _, weight in weighted)
+        results = {}
+        for q in sorted(set(qs)):
+            target = q * total
+            cumulative = 0
+            for item, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results[q] = item
+                    break
+            else:
+                results[q] = weighted[-1][0]
+
+        return [results[q] for q in qs]
+
+    def _capacity(self, h: int) -> int:
+        """
+        Returns the capacity of compactor h; the top compactor holds k values, and each one below holds 2/3 as many.
+        """
+        depth = len(self._compactors) - h - 1
+        return math.ceil(self._k * self._CAPACITY_DECAY ** depth) + 1
+
+    def _grow(self) -> None:
+        self._compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self._compactors)))
+
+    def _compress(self) -> None:
+        """
+        Compacts the lowest full compactor(s) until the sketch is back under its maximum size.
+        """
+        for h in range(len(self._compactors)):
+            if len(self._compactors[h]) >= self._capacity(h):
+                if h + 1 >= len(self._compactors):
+                    self._grow()
+                self._compactors[h + 1].extend(self._compact(self._compactors[h]))
+                self._size = sum(len(c) for c in self._compactors)
+                if self._size < self._max_size:
+                    break
+
+    def _compact(self, compactor: list) -> list:
+        """
+        Sorts compactor, empties it, and returns every other value starting from a random offset.
+        If compactor has an odd number of values, its largest one stays behind.
+        """
+        compactor.sort()
+        leftover = compactor.pop() if len(compactor) % 2 else None
+        promoted = compactor[self._random.randint(0, 1)::2]
+        compactor.clear()
+        if leftover is not None:
+            compactor.append(leftover)
+        return promoted
+
+
+if __name__ == '__main__':
+    pass
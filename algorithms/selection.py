@@ -14,8 +14,22 @@
 # For more information about selection, read https://en.wikipedia.org/wiki/Selection_algorithm.
 #
 # Author: Geoffrey Ko (2018)
+import array
+import bisect
+import concurrent.futures
 import math
+import os
 import random
+from multiprocessing import shared_memory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# memoryview formats of buffers that select(...) and quantiles(...) hand to NumPy
+_NUMERIC_FORMATS = set('bBhHiIlLqQnNefd')
 
 
 def brute_force_select(iterable, k: int):
@@ -23,7 +37,7 @@ def brute_force_select(iterable, k: int):
         k is 1-indexed.
     """
     iterable = sorted(iterable)
-    return iterable[k]
+    return iterable[k - 1]
 
 
 def quick_select(iterable, k: int):
@@ -39,9 +53,7 @@ def quick_select(iterable, k: int):
 
         where b is the overhead of each recursive call.
     """
-    random_median_index = random.randrange(len(iterable))
-    median = iterable[random_median_index]
-
+    median = _random_median(iterable)
     return _base_select(quick_select, median, iterable, k)
 
 
@@ -62,6 +74,84 @@ def deterministic_select(iterable, k: int):
     if size <= constant:
         return brute_force_select(iterable, k)
 
+    median_of_medians = _deterministic_median(iterable)
+    return _base_select(deterministic_select, median_of_medians, iterable, k)
+
+
+def multi_select(iterable, ks, deterministic=False) -> list:
+    """ Returns the k-th smallest value of iterable for each k in ks, in the same order as ks.
+        Each k is 1-indexed.
+
+        Partitions iterable into L, E, G as in _base_select, then recurses into L and G only with the ranks that fall inside them.
+        Each level of recursion partitions at most n values in total, and there are O(log m) levels for m distinct ranks
+        before every subrange holds a single rank, so this takes O(n log m) time instead of the O(nm) of m separate selections.
+
+        If deterministic=True, pivots are chosen by median-of-medians (see deterministic_select); otherwise, at random (see quick_select).
+    """
+    values = list(iterable)
+    for k in ks:
+        if not 1 <= k <= len(values):
+            raise IndexError('k={0} out of range for {1} values'.format(k, len(values)))
+
+    found = {}
+    if deterministic:
+        _multi_select(deterministic_select, _deterministic_median, values, sorted(set(ks)), 0, found)
+    else:
+        _multi_select(quick_select, _random_median, values, sorted(set(ks)), 0, found)
+    return [found[k] for k in ks]
+
+
+def _multi_select(selector: callable, choose_median: callable, iterable, ks: [int], offset: int, found: dict) -> None:
+    """ Recursive multi-selection.
+        Selects the k-th smallest value of iterable for each k in the sorted list ks,
+        storing it in found[k + offset].
+        Once only one rank remains, falls back to selector.
+    """
+    if len(ks) == 1:
+        found[ks[0] + offset] = selector(iterable, ks[0])
+        return
+
+    median = choose_median(iterable)
+    less = []
+    greater = []
+    equal_count = 0
+
+    for item in iterable:
+        if item < median:
+            less.append(item)
+        elif item > median:
+            greater.append(item)
+        else:
+            equal_count += 1
+
+    less_ks = []
+    greater_ks = []
+    for k in ks:
+        if k <= len(less):
+            less_ks.append(k)
+        elif k <= len(less) + equal_count:
+            found[k + offset] = median
+        else:
+            greater_ks.append(k - len(less) - equal_count)
+
+    if less_ks:
+        _multi_select(selector, choose_median, less, less_ks, offset, found)
+    if greater_ks:
+        _multi_select(selector, choose_median, greater, greater_ks, offset + len(less) + equal_count, found)
+
+
+def _random_median(iterable):
+    """ Returns a value of iterable chosen at random, as quick_select's "median". """
+    return iterable[random.randrange(len(iterable))]
+
+
+def _deterministic_median(iterable):
+    """ Returns the median-of-medians of iterable, as computed in steps 1-3 of deterministic_select. """
+    constant = 5
+    size = len(iterable)
+    if size <= constant:
+        return brute_force_select(iterable, math.ceil(size / 2))
+
     n_groups = math.ceil(size / constant)
     groups = [[None for _ in range(constant)] for _ in range(n_groups)]
     overflow = size % constant
@@ -77,8 +167,7 @@ def deterministic_select(iterable, k: int):
         local_median = brute_force_select(group, math.ceil(len(group) / 2))
         medians.append(local_median)
 
-    median_of_medians = deterministic_select(medians, math.ceil(len(medians) / 2))
-    return _base_select(deterministic_select, median_of_medians, iterable, k)
+    return deterministic_select(medians, math.ceil(len(medians) / 2))
 
 
 def _base_select(selector: callable, median, iterable, k: int):
@@ -112,5 +201,426 @@ def _base_select(selector: callable, median, iterable, k: int):
         return selector(greater, k - len(less) - equal_count)
 
 
+def introselect(seq, k: int):
+    """ Returns the k-th smallest value of seq in worst-case linear time, using O(1) extra memory outside of the fallback.
+        seq must be a mutable sequence (e.g., a list or array.array); it is reordered in place,
+        so that afterwards seq[k - 1] is the k-th smallest value, every value before it is <= it, and every value after it is >= it.
+
+        Iteratively partitions seq in place (three-way, so runs of equal values are eliminated at once) around a median-of-three pivot,
+        narrowing down to the side that contains index k - 1.
+        Once the values partitioned so far exceed 4n (pivots that each shrink the range to 3/4 of its size never get there),
+        switches to median-of-medians pivots (as in deterministic_select) for the rest of the selection,
+        bounding the run time to O(n) while keeping quick_select's constant factor in the common case.
+    """
+    if not 1 <= k <= len(seq):
+        raise IndexError('k={0} out of range for {1} values'.format(k, len(seq)))
+    return _introselect_range(seq, 0, len(seq) - 1, k - 1)
+
+
+def _introselect_range(seq, lo: int, hi: int, target: int):
+    """ Returns the value that belongs at index target if seq[lo:hi + 1] were sorted, partitioning that range in place. """
+    work_limit = 4 * (hi - lo + 1)
+    work = 0
+
+    while lo < hi:
+        size = hi - lo + 1
+        work += size
+        if work <= work_limit:
+            pivot = _median_of_three(seq[lo], seq[(lo + hi) // 2], seq[hi])
+        else:
+            pivot = _median_of_medians(seq, lo, hi)
+
+        less_end, greater_start = _partition_three_way(seq, lo, hi, pivot)
+        if target < less_end:
+            hi = less_end - 1
+        elif target >= greater_start:
+            lo = greater_start
+        else:
+            return pivot
+
+    return seq[target]
+
+
+def _partition_three_way(seq, lo: int, hi: int, pivot):
+    """ Partitions seq[lo:hi + 1] in place into values less than, equal to, and greater than pivot (Dijkstra's Dutch national flag).
+        Returns (less_end, greater_start): seq[lo:less_end] < pivot, seq[less_end:greater_start] == pivot, and seq[greater_start:hi + 1] > pivot.
+    """
+    less_end = lo
+    i = lo
+    greater_start = hi + 1
+    while i < greater_start:
+        item = seq[i]
+        if item < pivot:
+            seq[i], seq[less_end] = seq[less_end], item
+            less_end += 1
+            i += 1
+        elif item > pivot:
+            greater_start -= 1
+            seq[i], seq[greater_start] = seq[greater_start], item
+        else:
+            i += 1
+
+    return less_end, greater_start
+
+
+def _median_of_three(a, b, c):
+    if a < b:
+        return b if b < c else (c if a < c else a)
+    return a if a < c else (c if b < c else b)
+
+
+def _median_of_medians(seq, lo: int, hi: int):
+    """ Returns the median of the medians of each group of 5 values in seq[lo:hi + 1].
+        Each group is insertion-sorted in place, and its median is swapped to the front of the range;
+        the median of medians is then selected from that prefix.
+    """
+    constant = 5
+    n_medians = 0
+    for start in range(lo, hi + 1, constant):
+        end = min(start + constant - 1, hi)
+        _insertion_sort(seq, start, end)
+        median_index = start + (end - start) // 2
+        seq[lo + n_medians], seq[median_index] = seq[median_index], seq[lo + n_medians]
+        n_medians += 1
+
+    return _introselect_range(seq, lo, lo + n_medians - 1, lo + (n_medians - 1) // 2)
+
+
+def _insertion_sort(seq, lo: int, hi: int) -> None:
+    for i in range(lo + 1, hi + 1):
+        item = seq[i]
+        j = i - 1
+        while j >= lo and seq[j] > item:
+            seq[j + 1] = seq[j]
+            j -= 1
+        seq[j + 1] = item
+
+
+def select(data, k: int, backend='auto'):
+    """ Returns the k-th smallest value of data, without modifying it.
+        k is 1-indexed.
+
+        backend is one of:
+          'numpy':  partitions a NumPy array view of data with numpy.partition. Requires NumPy.
+          'python': runs introselect on a list copy of data.
+          'auto':   uses 'numpy' if NumPy is installed and data is a NumPy array or a numeric buffer (e.g., array.array),
+                    and 'python' otherwise.
+    """
+    backend = _resolve_backend(data, backend)
+    if backend == 'numpy':
+        values = _as_numpy_array(data)
+        if not 1 <= k <= len(values):
+            raise IndexError('k={0} out of range for {1} values'.format(k, len(values)))
+        return numpy.partition(values, k - 1)[k - 1].item()
+    return introselect(list(data), k)
+
+
+def quantiles(data, qs, backend='auto') -> list:
+    """ Returns the q-quantile of data for each q in qs, in the same order as qs, without modifying data.
+        Each q must be in [0, 1]; the q-quantile is the ⌈q * n⌉-th smallest value (the nearest-rank method), or the smallest value if q is 0.
+        data is copied and partitioned once for all qs. See select(...) for backend.
+    """
+    qs = list(qs)
+    backend = _resolve_backend(data, backend)
+    values = _as_numpy_array(data) if backend == 'numpy' else list(data)
+    if not len(values):
+        raise ValueError('cannot compute quantiles of empty data')
+    if any(not 0 <= q <= 1 for q in qs):
+        raise ValueError('quantiles must be in [0, 1]; were {0}'.format(qs))
+
+    indices = [max(math.ceil(q * len(values)), 1) - 1 for q in qs]
+    if backend == 'numpy':
+        partitioned = numpy.partition(values, sorted(set(indices)))
+        return [partitioned[i].item() for i in indices]
+
+    lo = 0
+    for i in sorted(set(indices)):
+        _introselect_range(values, lo, len(values) - 1, i)
+        lo = i
+    return [values[i] for i in indices]
+
+
+def _resolve_backend(data, backend: str) -> str:
+    """ Returns the backend ('numpy' or 'python') that select(...) and quantiles(...) should use for data. """
+    if backend not in ('auto', 'numpy', 'python'):
+        raise ValueError("backend must be 'auto', 'numpy', or 'python'; was {0}".format(backend))
+    if backend == 'numpy' and numpy is None:
+        raise ImportError("backend='numpy' requires NumPy")
+    if backend != 'auto':
+        return backend
+
+    if numpy is None:
+        return 'python'
+    if isinstance(data, numpy.ndarray):
+        return 'numpy'
+    try:
+        return 'numpy' if memoryview(data).format in _NUMERIC_FORMATS else 'python'
+    except TypeError:
+        return 'python'
+
+
+def _as_numpy_array(data):
+    """ Returns a NumPy array view of data. Buffers go through memoryview, since numpy.asarray(b'...') is a 0-d bytes array. """
+    if isinstance(data, numpy.ndarray):
+        return data
+    try:
+        return numpy.asarray(memoryview(data))
+    except TypeError:
+        return numpy.asarray(data)
+
+
+def floyd_rivest_select(iterable, k: int, key=None):
+    """ Returns the item of iterable with the k-th smallest key, in average-case linear time.
+        k is 1-indexed. key is a unary function returning the value to compare each item on, as in sorted(...);
+        items are compared through key directly, so no list of keys is ever built.
+
+        Floyd-Rivest selection improves on quick_select's pivot choice by recursively selecting two pivots from a small sample,
+        chosen so that the k-th smallest item very likely lies between them.
+        Partitioning around them discards almost everything in one pass,
+        so it takes n + min(k, n - k) + o(n) comparisons on average, compared to about 3.4n for quick_select.
+    """
+    items = list(iterable)
+    if not 1 <= k <= len(items):
+        raise IndexError('k={0} out of range for {1} values'.format(k, len(items)))
+    _floyd_rivest(items, 0, len(items) - 1, k - 1, key or _identity)
+    return items[k - 1]
+
+
+def smallest_k(iterable, k: int, key=None) -> list:
+    """ Returns a list of the k items of iterable with the smallest keys, in no particular order, in average-case linear time.
+        If k is at least the number of items, returns all of them.
+        key behaves as in floyd_rivest_select(...). To order the result, sort it afterwards in O(k log k) time.
+    """
+    items = list(iterable)
+    if k <= 0:
+        return []
+    if k < len(items):
+        _floyd_rivest(items, 0, len(items) - 1, k - 1, key or _identity)
+    return items[:k]
+
+
+def largest_k(iterable, k: int, key=None) -> list:
+    """ Returns a list of the k items of iterable with the largest keys, in no particular order, in average-case linear time.
+        If k is at least the number of items, returns all of them.
+        key behaves as in floyd_rivest_select(...).
+    """
+    items = list(iterable)
+    if k <= 0:
+        return []
+    if k < len(items):
+        _floyd_rivest(items, 0, len(items) - 1, len(items) - k, key or _identity)
+    return items[max(len(items) - k, 0):]
+
+
+def _identity(x):
+    return x
+
+
+def _floyd_rivest(items: list, left: int, right: int, target: int, key: callable) -> None:
+    """ Partitions items[left:right + 1] in place so that items[target] holds the item it would if that range were sorted by key,
+        with no greater keys before it and no smaller keys after it.
+    """
+    sample_threshold = 600
+    while right > left:
+        if right - left > sample_threshold:
+            # recursively select from a sample of size s around the expected position of target
+            n = right - left + 1
+            i = target - left + 1
+            z = math.log(n)
+            s = 0.5 * math.exp(2 * z / 3)
+            sd = 0.5 * math.sqrt(z * s * (n - s) / n) * (1 if i >= n / 2 else -1)
+            sample_left = max(left, math.floor(target - i * s / n + sd))
+            sample_right = min(right, math.floor(target + (n - i) * s / n + sd))
+            _floyd_rivest(items, sample_left, sample_right, target, key)
+
+        pivot = key(items[target])
+        i = left
+        j = right
+        items[left], items[target] = items[target], items[left]
+        if key(items[right]) > pivot:
+            items[left], items[right] = items[right], items[left]
+
+        while i < j:
+            items[i], items[j] = items[j], items[i]
+            i += 1
+            j -= 1
+            while key(items[i]) < pivot:
+                i += 1
+            while key(items[j]) > pivot:
+                j -= 1
+
+        if key(items[left]) == pivot:
+            items[left], items[j] = items[j], items[left]
+        else:
+            j += 1
+            items[j], items[right] = items[right], items[j]
+
+        if j <= target:
+            left = j + 1
+        if target <= j:
+            right = j - 1
+
+
+def parallel_select(data, k: int, workers=None, typecode=None, splitters=64, gather_limit=100000):
+    """ Returns the k-th smallest value of data, a sequence of numbers, using 'workers' processes (by default, one per CPU).
+        k is 1-indexed.
+
+        A generalization of _base_select to many "medians" at once:
+        1) data is copied once into shared memory as an array of typecode, and divided into one chunk per worker.
+        2) Each worker draws a random sample of the values in its chunk that are still candidates,
+           and 'splitters' evenly-spaced values of the combined sample are chosen as pivots.
+        3) Each worker counts how many of its candidates fall strictly between, or are equal to, each pair of consecutive pivots.
+        4) The coordinator sums the counts, and keeps only the bucket that contains rank k - like L, E, or G in _base_select.
+           If that bucket holds values equal to a pivot, the pivot is the answer.
+        5) Once at most gather_limit candidates remain, they are gathered and selected with introselect.
+
+        Only counts and samples are sent between processes, never the data itself.
+        Each round shrinks the candidates by a factor of about 'splitters', so there are O(log(n / gather_limit) / log(splitters)) rounds.
+
+        typecode is the array module type code that data is stored as in shared memory. If None, it is inferred:
+        the type code of an array.array or of a numeric buffer; otherwise 'q' if every value is an int, and 'd' if not.
+        The result is exact: raises OverflowError if an int doesn't fit in typecode, and ValueError if it can't be stored exactly as a float.
+    """
+    workers = workers or os.cpu_count() or 1
+    typecode = typecode or _infer_typecode(data)
+    values = array.array(typecode, data)
+    if typecode in 'fd' and any(isinstance(item, int) and value != item for value, item in zip(values, data)):
+        raise ValueError("data has ints that typecode '{0}' can't represent exactly".format(typecode))
+    size = len(values)
+    if not 1 <= k <= size:
+        raise IndexError('k={0} out of range for {1} values'.format(k, size))
+
+    memory = shared_memory.SharedMemory(create=True, size=size * values.itemsize)
+    try:
+        memory.buf[:size * values.itemsize] = memoryview(values).cast('B')
+        del values
+        chunk_size = math.ceil(size / workers)
+        chunks = [(memory.name, typecode, size, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InProcessExecutor() as executor:
+            lower, upper = None, None
+            remaining = size
+            sample_size = max(4 * splitters // len(chunks), 1)
+
+            while remaining > gather_limit:
+                samples = executor.map(_sample_chunk, *zip(*[chunk + (lower, upper, sample_size) for chunk in chunks]))
+                sample = sorted(item for chunk_sample in samples for item in chunk_sample)
+                pivots = sorted(set(sample[i * len(sample) // splitters] for i in range(splitters)))
+
+                counts = [0] * (2 * len(pivots) + 1)
+                for chunk_counts in executor.map(_count_chunk, *zip(*[chunk + (lower, upper, pivots) for chunk in chunks])):
+                    counts = [a + b for a, b in zip(counts, chunk_counts)]
+
+                # buckets alternate: (lower, p0), [p0], (p0, p1), [p1], ..., (p_last, upper)
+                for bucket, count in enumerate(counts):
+                    if k <= count:
+                        break
+                    k -= count
+
+                if bucket % 2:
+                    return pivots[bucket // 2]
+                lower = pivots[bucket // 2 - 1] if bucket else lower
+                upper = pivots[bucket // 2] if bucket < len(counts) - 1 else upper
+                remaining = counts[bucket]
+
+            candidates = []
+            for chunk_candidates in executor.map(_gather_chunk, *zip(*[chunk + (lower, upper) for chunk in chunks])):
+                candidates.extend(chunk_candidates)
+
+        return introselect(candidates, k)
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def _infer_typecode(data) -> str:
+    """ Returns the array module type code that parallel_select(...) stores data as, if not given one. """
+    if isinstance(data, array.array):
+        return data.typecode
+    try:
+        format = memoryview(data).format
+        if format in _NUMERIC_FORMATS and format in array.typecodes:
+            return format
+    except TypeError:
+        pass
+    return 'q' if all(isinstance(item, int) for item in data) else 'd'
+
+
+class _InProcessExecutor:
+    """ Stands in for a ProcessPoolExecutor when parallel_select(...) runs with a single worker. """
+    def __enter__(self) -> '_InProcessExecutor':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    @staticmethod
+    def map(function: callable, *iterables):
+        return map(function, *iterables)
+
+
+def _candidates_of(name: str, typecode: str, length: int, start: int, end: int, lower, upper):
+    """ Yields the values in chunk [start, end) of the shared array that lie strictly between lower and upper (None meaning unbounded). """
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        view = memory.buf.cast('B').cast(typecode)[:length]
+        for item in view[start:end]:
+            if (lower is None or item > lower) and (upper is None or item < upper):
+                yield item
+        view.release()
+    finally:
+        memory.close()
+
+
+def _sample_chunk(name: str, typecode: str, length: int, start: int, end: int, lower, upper, size: int) -> list:
+    """ Returns a uniform random sample of up to 'size' candidates in a chunk, by reservoir sampling (Li's Algorithm L). """
+    reservoir = []
+    rng = random.Random()
+    weight = 1.0
+    next_index = size
+    for i, item in enumerate(_candidates_of(name, typecode, length, start, end, lower, upper)):
+        if i < size:
+            reservoir.append(item)
+            if i == size - 1:
+                weight = math.exp(math.log(rng.random() or 1e-300) / size)
+                next_index = size + math.floor(math.log(rng.random() or 1e-300) / math.log(1 - weight))
+        elif i == next_index:
+            reservoir[rng.randrange(size)] = item
+            weight *= math.exp(math.log(rng.random() or 1e-300) / size)
+            next_index += math.floor(math.log(rng.random() or 1e-300) / math.log(1 - weight)) + 1
+
+    return reservoir
+
+
+def _count_chunk(name: str, typecode: str, length: int, start: int, end: int, lower, upper, pivots: list) -> list:
+    """ Returns the number of candidates in a chunk within each bucket: (lower, p0), [p0], (p0, p1), [p1], ..., (p_last, upper). """
+    counts = [0] * (2 * len(pivots) + 1)
+    for item in _candidates_of(name, typecode, length, start, end, lower, upper):
+        i = bisect.bisect_left(pivots, item)
+        if i < len(pivots) and pivots[i] == item:
+            counts[2 * i + 1] += 1
+        else:
+            counts[2 * i] += 1
+
+    return counts
+
+
+def _gather_chunk(name: str, typecode: str, length: int, start: int, end: int, lower, upper) -> list:
+    return list(_candidates_of(name, typecode, length, start, end, lower, upper))
+
+
 if __name__ == '__main__':
-    pass
\ No newline at end of file
+    import timeit
+
+    # compares the backends of select(...) on random doubles, plus quick_select as a baseline
+    for size in (100, 10000, 1000000):
+        data = array.array('d', (random.random() for _ in range(size)))
+        k = size // 2
+        repeat = max(1, 100000 // size)
+        candidates = [('quick_select', lambda: quick_select(data, k)), ('python', lambda: select(data, k, backend='python'))]
+        if numpy is not None:
+            candidates.append(('numpy', lambda: select(data, k, backend='numpy')))
+
+        for name, run in candidates:
+            seconds = timeit.timeit(run, number=repeat) / repeat
+            print('n={0:>8} {1:>13}: {2:10.3f} ms'.format(size, name, 1000 * seconds))
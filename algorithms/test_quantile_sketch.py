@@ -0,0 +1,67 @@
+import bisect
+import random
+import unittest
+
+from quantile_sketch import KLLSketch
+
+
+class TestKLLSketch(unittest.TestCase):
+    """
+    Checks the KLL guarantees: estimated ranks are within a small fraction of n of the true ranks,
+    for a single sketch and for sketches merged from shards, while the number of retained values stays O(k).
+    """
+    K = 200
+    TOLERANCE = 0.02
+
+    def assert_rank_error(self, sketch: KLLSketch, values: list) -> None:
+        ordered = sorted(values)
+        n = len(ordered)
+        for q in [i / 20 for i in range(21)]:
+            value = ordered[min(int(q * n), n - 1)]
+            true_rank = bisect.bisect_right(ordered, value)
+            self.assertLessEqual(abs(sketch.rank(value) - true_rank), self.TOLERANCE * n, value)
+
+            estimate = sketch.quantile(q)
+            self.assertLessEqual(abs(bisect.bisect_right(ordered, estimate) - q * n), self.TOLERANCE * n, q)
+
+    def assert_bounded_size(self, sketch: KLLSketch) -> None:
+        retained = sum(len(compactor) for compactor in sketch._compactors)
+        # capacities shrink by 2/3 below the top compactor, so they sum to less than 3k, plus 1 per compactor
+        self.assertLessEqual(retained, 3 * self.K + len(sketch._compactors))
+
+    def test_single_sketch(self):
+        generator = random.Random(1)
+        values = [generator.gauss(0, 1) for _ in range(50000)]
+        sketch = KLLSketch(values, k=self.K, seed=1)
+
+        self.assertEqual(len(sketch), len(values))
+        self.assert_rank_error(sketch, values)
+        self.assert_bounded_size(sketch)
+
+    def test_merged_sketches(self):
+        generator = random.Random(2)
+        shards = [[generator.randrange(100000) for _ in range(10000)] for _ in range(5)]
+        merged = KLLSketch(shards[0], k=self.K, seed=2)
+        for shard in shards[1:]:
+            merged.merge(KLLSketch(shard, k=self.K, seed=3))
+
+        values = [value for shard in shards for value in shard]
+        self.assertEqual(len(merged), len(values))
+        self.assert_rank_error(merged, values)
+        self.assert_bounded_size(merged)
+
+    def test_bounded_size(self):
+        sketch = KLLSketch(k=self.K, seed=4)
+        for value in range(200000):
+            sketch.update(value)
+            if value % 1000 == 0:
+                self.assert_bounded_size(sketch)
+
+    def test_quantiles_of_iterator(self):
+        # fewer values than k are kept exactly
+        sketch = KLLSketch(range(1, 101), k=self.K, seed=5)
+        self.assertEqual(sketch.quantiles(iter([0, 0.5, 1])), [1, 50, 100])
+
+
+if __name__ == '__main__':
+    unittest.main()
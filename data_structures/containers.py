@@ -1,4 +1,5 @@
 import abc
+import array
 
 
 class BaseContainer(metaclass=abc.ABCMeta):
@@ -60,5 +61,62 @@ class BaseContainer(metaclass=abc.ABCMeta):
         return initializer((i for i in self))
 
 
+
+class ArrayContainer(BaseContainer):
+    """
+    A base class for containers of numbers of a single C type, stored unboxed in an array.array.
+    'typecode' is any array module type code (e.g., 'd' for double, 'l' for signed long).
+
+    Compared to BaseContainer, equality is a single C-level comparison of both arrays,
+    copy() duplicates the array's memory in one block,
+    and the items can be exported without copying through as_memoryview() (or memoryview(container) on Python 3.12+).
+    Derived classes' __init__ must accept (iterable=None, typecode=...) for copy() to work.
+    """
+    _REPR_LIMIT = 10
+
+    def __init__(self, iterable=None, typecode='d'):
+        self.__array = array.array(typecode, iterable if iterable is not None else ())
+
+    @property
+    def _container(self) -> array.array:
+        return self.__array
+
+    def __repr__(self) -> str:
+        name = type(self).__name__
+        contents = ', '.join([str(item) for item in self._container[:self._REPR_LIMIT]])
+        if len(self) > self._REPR_LIMIT:
+            contents += ', ... ({0} more)'.format(len(self) - self._REPR_LIMIT)
+        return "{0}([{1}], typecode='{2}')".format(name, contents, self.typecode)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, type(self)) and self.typecode == other.typecode and self._container == other._container
+
+    def __buffer__(self, flags: int) -> memoryview:
+        return memoryview(self._container)
+
+    @property
+    def typecode(self) -> str:
+        return self._container.typecode
+
+    @property
+    def itemsize(self) -> int:
+        return self._container.itemsize
+
+    @property
+    def nbytes(self) -> int:
+        return self.itemsize * len(self._container)
+
+    def as_memoryview(self) -> memoryview:
+        """
+        Returns a memoryview over the underlying array, without copying.
+        While the view is alive, the array cannot change size.
+        """
+        return memoryview(self._container)
+
+    def copy(self):
+        initializer = type(self)
+        return initializer(self._container, typecode=self.typecode)
+
+
 if __name__ == '__main__':
     pass
\ No newline at end of file
@@ -4,7 +4,7 @@ import functools
 import math
 from .error import GraphError
 from .info import Vertex, UndirectedEdge
-from queues import PriorityQueue
+from queues import BucketQueue, PriorityQueue
 
 
 
@@ -96,26 +96,39 @@ class _BaseGraph(metaclass=abc.ABCMeta):
 
 
     def dijkstra(self, origin_vertex_value, destination_vertex_value) -> collections.deque([Vertex]):
+        """
+        Returns the shortest path from the origin vertex to the destination vertex, as a deque of vertices.
+        Edge weights must be non-negative.
+
+        If every edge weight is an integer, a BucketQueue is used (Dial's algorithm),
+        which takes O(m + W) time, where W is the largest shortest-path distance.
+        Otherwise, a PriorityQueue is used, in O(m log n) time.
+        Stale queue entries are skipped when popped, rather than removed when a label is lowered.
+        """
         labels = {}
         parents = {}
         for v in self.vertices():
             labels[v] = math.inf
             parents[v] = None
-        labels[self[origin_vertex_value]] = 0
-        table = PriorityQueue([v for v in self.vertices()], key=lambda v: labels[v], reverse=True)  # min-heap
+        origin = self[origin_vertex_value]
+        labels[origin] = 0
+
+        if all(isinstance(e.weight, int) and e.weight >= 0 for e in self.edges()):
+            table = BucketQueue([(0, origin)], key=lambda entry: entry[0])
+        else:
+            table = PriorityQueue([(0, origin)], key=lambda entry: entry[0], reverse=True)  # min-heap
 
         while table:
-            start = table.pop()
+            distance, start = table.pop()
+            if distance > labels[start]:
+                continue
             for adjacent_edge in start.outgoing_edges:
                 end = adjacent_edge.destination
-                index = table.find(end)
-                if index != -1:
-                    weighted_distance = labels[start] + adjacent_edge.weight
-                    if weighted_distance < labels[end]:
-                        labels[end] = weighted_distance
-                        table.remove(index)
-                        table.push(end)
-                        parents[end] = start
+                weighted_distance = distance + adjacent_edge.weight
+                if weighted_distance < labels[end]:
+                    labels[end] = weighted_distance
+                    parents[end] = start
+                    table.push((weighted_distance, end))
 
         result = collections.deque()
         start = self[destination_vertex_value]
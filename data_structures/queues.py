@@ -1,8 +1,13 @@
 # Author: Geoffrey Ko (2018)
 # Developed with Python 3.5.0b3
 import abc
+import array
+import collections
+import functools
 import math
 import operator
+import pickle
+import tempfile
 from containers import BaseContainer
 
 
@@ -13,7 +18,7 @@ class BaseQueue(BaseContainer, metaclass=abc.ABCMeta):
     Derived classes MUST implement methods top(), push(), and pop().
     """
     def __init__(self, iterable=None):
-        self.__container = self._container_type(iterable)
+        self.__container = self._container_type() if iterable is None else self._container_type(iterable)
 
     @property
     @abc.abstractmethod
@@ -293,5 +298,631 @@ class PriorityQueue(BaseQueue):
         return 2 * i + 2
 
 
+
+class BucketQueue(BaseQueue):
+    """
+    A monotone min-priority queue for non-negative integer priorities (a.k.a. Dial's bucket queue).
+    Items are stored in one FIFO bucket per priority, so no comparisons between keys are ever made.
+
+    Priorities must be monotone: an item may not be pushed with a priority lower than that of the last popped item.
+    This holds for label-setting algorithms like Dijkstra's with non-negative integer edge weights.
+    Items sharing a priority are popped in the order they were pushed.
+    """
+
+    @property
+    def _container_type(self) -> type:
+        return dict
+
+
+    def __init__(self, iterable=None, key=lambda x: x):
+        """
+        Initialize a BucketQueue object.
+
+        * iterable: if non-empty, pushes in all items.
+        * key: unary callable function that returns the non-negative integer priority of an item.
+        """
+        super().__init__()
+
+        if not callable(key):
+            raise ValueError('key must be a unary callable predicate')
+
+        self._key = key
+        self._cursor = 0        # no bucket below this priority is non-empty
+        self._last_popped = 0   # pushes below this priority are rejected
+        self._size = 0
+
+        if iterable:
+            for item in iterable:
+                self.push(item)
+
+
+    def __repr__(self) -> str:
+        contents = ', '.join([str(item) for item in self])
+        return '{0}([{1}], key={2})'.format(type(self).__name__, contents, self._key)
+
+
+    def __iter__(self):
+        for priority in sorted(self._container):
+            yield from self._container[priority]
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def __contains__(self, item) -> bool:
+        priority = self._key(item)
+        return priority in self._container and item in self._container[priority]
+
+
+    def copy(self) -> 'BucketQueue':
+        """
+        Returns a new BucketQueue object containing the same properties and values as this one.
+        """
+        result = BucketQueue(key=self._key)
+        result._cursor = self._cursor
+        result._last_popped = self._last_popped
+        for item in self:
+            result.push(item)
+        return result
+
+
+    def top(self):
+        """
+        Returns the item with the lowest priority in the queue.
+        Raises ValueError if the queue is empty.
+
+        Amortized O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot retrieve the top of an empty queue')
+        return self._container[self._advance()][0]
+
+
+    def push(self, item) -> None:
+        """
+        Adds 'item' into the bucket for its priority.
+        Raises ValueError if its priority is not a non-negative integer,
+        or if it is lower than the priority of the last popped item.
+
+        O(1) time.
+        """
+        priority = self._key(item)
+        if not isinstance(priority, int) or priority < 0:
+            raise ValueError('priority must be a non-negative integer; was {0}'.format(priority))
+        if priority < self._last_popped:
+            raise ValueError('priority {0} is lower than the last popped priority {1}'.format(priority, self._last_popped))
+
+        # top() may have moved the cursor past this priority without popping anything
+        self._cursor = min(self._cursor, priority)
+        if priority not in self._container:
+            self._container[priority] = collections.deque()
+        self._container[priority].append(item)
+        self._size += 1
+
+
+    def pop(self):
+        """
+        Removes and returns the item with the lowest priority in the queue.
+        Raises ValueError if the queue is already empty.
+
+        Amortized O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot pop from an empty queue')
+
+        priority = self._advance()
+        self._last_popped = priority
+        bucket = self._container[priority]
+        result = bucket.popleft()
+        if not bucket:
+            del self._container[priority]
+        self._size -= 1
+        return result
+
+
+    def _advance(self) -> int:
+        """
+        Moves the cursor forward to the lowest non-empty bucket, and returns its priority.
+        The queue must not be empty.
+
+        The cursor only moves backwards when an item is pushed below it after top(), but not below the last popped priority,
+        so all calls together take O(max priority) time, plus the distance it moved back for each such push.
+        """
+        while self._cursor not in self._container:
+            self._cursor += 1
+        return self._cursor
+
+
+
+class SpillingPriorityQueue(BaseQueue):
+    """
+    An external-memory priority queue, for workloads that push more items than fit in memory.
+    Ordering is controlled through 'key', 'reverse', 'greater_than' and 'less_than', exactly like PriorityQueue.
+
+    At most 'memory_limit' items are held in an in-memory PriorityQueue.
+    Once that limit is exceeded, the in-memory items are sorted and written out as a run to a temporary file.
+    pop() then merges the in-memory heap with one buffered reader per run, so disk access is always sequential.
+    Items must be serializable by 'serializer' (pickle by default); 'key' is never serialized.
+
+    Each run holds an open file and its buffer, so at most 'max_runs' runs are kept.
+    When a spill would exceed that, the smaller half of the runs are merged into one bigger run first.
+    Merging the smallest runs keeps their sizes roughly geometric, so each item is rewritten O(log(n / memory_limit)) times.
+    """
+
+    @property
+    def _container_type(self) -> type:
+        return list
+
+
+    def __init__(self, iterable=None, key=lambda x: x, reverse=False, greater_than=operator.gt, less_than=operator.lt,
+                 memory_limit=100000, serializer=pickle, buffer_size=65536, directory=None, max_runs=16):
+        """
+        Initialize a SpillingPriorityQueue object.
+
+        * iterable, key, reverse, greater_than, less_than: see PriorityQueue.
+        * memory_limit: maximum number of items to keep in memory before spilling a sorted run to disk.
+        * serializer: an object providing dump(item, file) and load(file), like the pickle module.
+        * buffer_size: size in bytes of the I/O buffer of each run file.
+        * directory: directory in which run files are created. If None, the platform's default temporary directory.
+        * max_runs: maximum number of run files open at once. Must be at least 2.
+        """
+        super().__init__()
+
+        if not callable(key):
+            raise ValueError('key must be a unary callable predicate')
+        if memory_limit < 1:
+            raise ValueError('memory_limit must be positive; was {0}'.format(memory_limit))
+        if max_runs < 2:
+            raise ValueError('max_runs must be at least 2; was {0}'.format(max_runs))
+
+        self._key = key
+        self._reverse = reverse
+        self._greater_than = greater_than
+        self._less_than = less_than
+        self._comparator = self._less_than if reverse else self._greater_than
+        self._memory_limit = memory_limit
+        self._serializer = serializer
+        self._buffer_size = buffer_size
+        self._directory = directory
+        self._max_runs = max_runs
+        self._size = 0
+
+        self._heap = self._make_heap()
+        self._heads = self._make_heads()
+
+        if iterable:
+            for item in iterable:
+                self.push(item)
+
+
+    def __repr__(self) -> str:
+        return '{0}(size={1}, runs={2}, key={3}, reverse={4})'.format(
+            type(self).__name__, len(self), len(self._heads), self._key, self._reverse)
+
+
+    def __iter__(self):
+        """
+        Yields every item in the queue, in no particular order.
+        Items that were spilled to disk are read back from their run files.
+        """
+        yield from self._heap
+        for run in self._heads:
+            yield from run
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def __contains__(self, item) -> bool:
+        return any(item == i for i in self)
+
+
+    def __enter__(self) -> 'SpillingPriorityQueue':
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+    def copy(self) -> 'SpillingPriorityQueue':
+        """
+        Returns a new SpillingPriorityQueue object containing the same properties and values as this one.
+        The copy spills to its own run files.
+        """
+        return SpillingPriorityQueue(
+            self,
+            key=self._key,
+            reverse=self._reverse,
+            greater_than=self._greater_than,
+            less_than=self._less_than,
+            memory_limit=self._memory_limit,
+            serializer=self._serializer,
+            buffer_size=self._buffer_size,
+            directory=self._directory,
+            max_runs=self._max_runs
+        )
+
+
+    def close(self) -> None:
+        """
+        Empties the queue and deletes all of its run files.
+        """
+        while self._heads:
+            self._heads.pop().close()
+        self._heap = self._make_heap()
+        self._size = 0
+
+
+    def top(self):
+        """
+        Returns the highest-priority object in the queue.
+        Raises ValueError if the queue is empty.
+
+        O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot retrieve the top of an empty queue')
+        if self._top_is_spilled():
+            return self._heads.top().head
+        return self._heap.top()
+
+
+    def push(self, item) -> None:
+        """
+        Adds 'item' into the queue, in its appropriate order.
+        Spills the in-memory items to a new run file if the memory limit is exceeded.
+
+        O(log n) time, plus O(n log n) time for a spill.
+        """
+        self._heap.push(item)
+        self._size += 1
+        if len(self._heap) > self._memory_limit:
+            self._spill()
+
+
+    def pop(self):
+        """
+        Removes and returns the highest-priority object in the queue.
+        Raises ValueError if the queue is already empty.
+
+        O(log n + log r) time, where r is the number of runs on disk.
+        """
+        if not self:
+            raise ValueError('Cannot pop from an empty queue')
+
+        self._size -= 1
+        if not self._top_is_spilled():
+            return self._heap.pop()
+
+        run = self._heads.pop()
+        result = run.head
+        if run.advance():
+            self._heads.push(run)
+        else:
+            run.close()
+        return result
+
+
+    def _top_is_spilled(self) -> bool:
+        """
+        Returns True if the highest-priority object is at the head of a run, rather than in the in-memory heap.
+        The queue must not be empty.
+        """
+        if not self._heads:
+            return False
+        if not self._heap:
+            return True
+        return self._comparator(self._key(self._heads.top().head), self._key(self._heap.top()))
+
+
+    def _make_heap(self) -> PriorityQueue:
+        return PriorityQueue(key=self._key, reverse=self._reverse,
+                             greater_than=self._greater_than, less_than=self._less_than)
+
+
+    def _make_heads(self, runs=None) -> PriorityQueue:
+        return PriorityQueue(runs, key=lambda run: self._key(run.head), reverse=self._reverse,
+                             greater_than=self._greater_than, less_than=self._less_than)
+
+
+    def _spill(self) -> None:
+        """
+        Sorts the in-memory items into queue order, writes them to a new run file, and empties the in-memory heap.
+
+        O(n log n) time.
+        """
+        def compare(a, b) -> int:
+            key_a = self._key(a)
+            key_b = self._key(b)
+            if self._comparator(key_a, key_b):
+                return -1
+            elif self._comparator(key_b, key_a):
+                return 1
+            return 0
+
+        if len(self._heads) >= self._max_runs:
+            self._merge_runs()
+
+        items = sorted(self._heap._container, key=functools.cmp_to_key(compare))
+        run = _SortedRun(items, self._serializer, self._buffer_size, self._directory)
+        self._heads.push(run)
+        self._heap = self._make_heap()
+
+
+    def _merge_runs(self) -> None:
+        """
+        Merges the smaller half of the runs (at least 2) into a single new run, closing their files.
+
+        O(m log r) time to merge m items from r runs.
+        """
+        runs = sorted(self._heads, key=len)
+        count = max(len(runs) // 2, 2)
+        merging, kept = self._make_heads(runs[:count]), runs[count:]
+
+        def merged():
+            while merging:
+                run = merging.pop()
+                yield run.head
+                if run.advance():
+                    merging.push(run)
+                else:
+                    run.close()
+
+        kept.append(_SortedRun(merged(), self._serializer, self._buffer_size, self._directory))
+        self._heads = self._make_heads(kept)
+
+
+
+class FifoQueue(BaseQueue):
+    """
+    A first-in, first-out queue of arbitrary Python objects, backed by a collections.deque.
+    """
+
+    @property
+    def _container_type(self) -> type:
+        return collections.deque
+
+
+    def top(self):
+        """
+        Returns the oldest item in the queue.
+        Raises ValueError if the queue is empty.
+
+        O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot retrieve the top of an empty queue')
+        return self._container[0]
+
+
+    def push(self, item) -> None:
+        """
+        Adds 'item' to the back of the queue.
+
+        O(1) time.
+        """
+        self._container.append(item)
+
+
+    def pop(self):
+        """
+        Removes and returns the oldest item in the queue.
+        Raises ValueError if the queue is already empty.
+
+        O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot pop from an empty queue')
+        return self._container.popleft()
+
+
+
+class TypedRingQueue(BaseQueue):
+    """
+    A first-in, first-out queue of numbers of a single C type, stored unboxed in a growable array.array ring buffer.
+    'typecode' is any array module type code (e.g., 'd' for double, 'l' for signed long).
+
+    Items are stored as raw machine values rather than Python objects, so a queue of n floats costs 8n bytes.
+    The ring buffer doubles its capacity when full; push() and pop() are amortized O(1).
+    The queued items can be read without copying through segments().
+    """
+
+    @property
+    def _container_type(self) -> type:
+        return functools.partial(array.array, self._typecode)
+
+
+    def __init__(self, iterable=None, typecode='d', capacity=16):
+        """
+        Initialize a TypedRingQueue object.
+
+        * iterable: if non-empty, pushes in all items.
+        * typecode: the array module type code of the items.
+        * capacity: the number of items that fit in the buffer before it grows.
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be positive; was {0}'.format(capacity))
+
+        self._typecode = typecode
+        super().__init__()
+        self._container.extend(array.array(typecode, bytes(array.array(typecode).itemsize * capacity)))
+        self._head = 0
+        self._size = 0
+
+        if iterable:
+            for item in iterable:
+                self.push(item)
+
+
+    def __repr__(self) -> str:
+        contents = ', '.join([str(item) for item in self])
+        return "{0}([{1}], typecode='{2}')".format(type(self).__name__, contents, self._typecode)
+
+
+    def __iter__(self):
+        for segment in self.segments():
+            yield from segment
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def __contains__(self, item) -> bool:
+        return any(item == i for i in self)
+
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, type(self)) and \
+               self._typecode == other._typecode and \
+               len(self) == len(other) and \
+               all(a == b for a, b in zip(self, other))
+
+
+    @property
+    def typecode(self) -> str:
+        return self._typecode
+
+
+    @property
+    def capacity(self) -> int:
+        return len(self._container)
+
+
+    def copy(self) -> 'TypedRingQueue':
+        """
+        Returns a new TypedRingQueue object containing the same type code and values as this one.
+        """
+        return TypedRingQueue(self, typecode=self._typecode, capacity=max(len(self), 1))
+
+
+    def top(self):
+        """
+        Returns the oldest item in the queue.
+        Raises ValueError if the queue is empty.
+
+        O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot retrieve the top of an empty queue')
+        return self._container[self._head]
+
+
+    def push(self, item) -> None:
+        """
+        Adds 'item' to the back of the queue.
+        Raises TypeError or OverflowError if 'item' cannot be stored as the queue's type code.
+        Raises BufferError if the buffer must grow while a memoryview from segments() is still alive.
+
+        Amortized O(1) time.
+        """
+        if self._size == self.capacity:
+            self._grow()
+        self._container[(self._head + self._size) % self.capacity] = item
+        self._size += 1
+
+
+    def pop(self):
+        """
+        Removes and returns the oldest item in the queue.
+        Raises ValueError if the queue is already empty.
+
+        O(1) time.
+        """
+        if not self:
+            raise ValueError('Cannot pop from an empty queue')
+
+        result = self._container[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        return result
+
+
+    def segments(self) -> [memoryview]:
+        """
+        Returns the queued items as at most 2 memoryviews over the underlying buffer, in queue order.
+        No data is copied; the views are invalidated by later pushes and pops.
+        While any view is alive, the buffer cannot grow.
+        """
+        view = memoryview(self._container)
+        end = self._head + self._size
+        if end <= self.capacity:
+            return [view[self._head:end]]
+        return [view[self._head:], view[:end - self.capacity]]
+
+
+    def _grow(self) -> None:
+        """
+        Doubles the capacity of the buffer, moving the queued items to its front.
+        The buffer is resized before anything is moved, so if a memoryview is still alive, the BufferError leaves the queue intact.
+
+        O(n) time.
+        """
+        capacity = self.capacity
+        items = self._container[self._head:] + self._container[:self._head]
+        self._container.extend(items)
+        self._container[:capacity] = items
+        self._head = 0
+
+
+
+class _SortedRun:
+    """
+    A sequence of already-ordered items, written to a temporary file and read back sequentially.
+    The run's next item is always available in memory as 'head'.
+    items may be any non-empty iterable; it is consumed one item at a time.
+    """
+    def __init__(self, items, serializer, buffer_size: int, directory=None):
+        self._serializer = serializer
+        self._file = tempfile.TemporaryFile(buffering=buffer_size, dir=directory)
+        items = iter(items)
+        self.head = next(items)
+        self._remaining = 0
+        for item in items:
+            self._serializer.dump(item, self._file)
+            self._remaining += 1
+        self._file.seek(0)
+
+
+    def __len__(self) -> int:
+        """
+        Returns the number of items left in the run, including the head.
+        """
+        return self._remaining + 1
+
+
+    def __iter__(self):
+        """
+        Yields the head and every item left in the file, without consuming them.
+        """
+        yield self.head
+        position = self._file.tell()
+        try:
+            for _ in range(self._remaining):
+                yield self._serializer.load(self._file)
+        finally:
+            self._file.seek(position)
+
+
+    def advance(self) -> bool:
+        """
+        Reads the next item into 'head'.
+        Returns False if the run has been exhausted.
+        """
+        if not self._remaining:
+            self.head = None
+            return False
+        self.head = self._serializer.load(self._file)
+        self._remaining -= 1
+        return True
+
+
+    def close(self) -> None:
+        self._file.close()
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,115 @@
+import collections
+import random
+import unittest
+
+from hash_tables import ApproximateMultiSet, IntCounter, IntHashMap
+
+
+class TestApproximateMultiSet(unittest.TestCase):
+    """
+    Checks the Count-Min guarantee: count(x) never undercounts, and count(x) - true count <= error_bound()
+    for at least a 1 - delta fraction of keys (including keys that were never added).
+    """
+    EPSILON = 0.005
+    DELTA = 0.01
+
+    def assert_error_bound(self, sketch: ApproximateMultiSet, true_counts: collections.Counter, absent) -> None:
+        keys = list(true_counts) + list(absent)
+        within_bound = 0
+        for key in keys:
+            estimate = sketch.count(key)
+            self.assertGreaterEqual(estimate, true_counts[key], key)
+            if estimate - true_counts[key] <= sketch.error_bound():
+                within_bound += 1
+        self.assertGreaterEqual(within_bound / len(keys), 1 - self.DELTA)
+
+    def test_string_keys(self):
+        generator = random.Random(1)
+        stream = ['key-{0}'.format(int(generator.paretovariate(1.2))) for _ in range(50000)]
+        sketch = ApproximateMultiSet(stream, epsilon=self.EPSILON, delta=self.DELTA)
+
+        self.assertEqual(len(sketch), len(stream))
+        self.assert_error_bound(sketch, collections.Counter(stream), ['absent-{0}'.format(i) for i in range(2000)])
+
+    def test_integer_keys(self):
+        generator = random.Random(2)
+        stream = [generator.randrange(5000) for _ in range(50000)]
+        sketch = ApproximateMultiSet(stream, epsilon=self.EPSILON, delta=self.DELTA)
+
+        self.assert_error_bound(sketch, collections.Counter(stream), range(5000, 7000))
+
+    def test_integer_keys_colliding_in_one_row(self):
+        # every key is congruent modulo the width, so all of them share a column unless the hash is mixed
+        sketch = ApproximateMultiSet(epsilon=self.EPSILON, delta=self.DELTA)
+        stream = [j * sketch._width for j in range(1, 200) for _ in range(50)]
+        for item in stream:
+            sketch.add(item)
+
+        self.assert_error_bound(sketch, collections.Counter(stream), [0] + [j * sketch._width for j in range(200, 2200)])
+
+    def test_merged_shards(self):
+        generator = random.Random(3)
+        shards = [[generator.randrange(3000) for _ in range(20000)], ['key-{0}'.format(generator.randrange(3000)) for _ in range(20000)]]
+        merged = ApproximateMultiSet(shards[0], epsilon=self.EPSILON, delta=self.DELTA)
+        merged.merge(ApproximateMultiSet(shards[1], epsilon=self.EPSILON, delta=self.DELTA))
+
+        self.assertEqual(len(merged), 40000)
+        self.assert_error_bound(merged, collections.Counter(shards[0] + shards[1]), range(3000, 5000))
+
+    def test_copy(self):
+        sketch = ApproximateMultiSet(['x'] * 100 + ['y'] * 5)
+        copy = sketch.copy()
+
+        self.assertEqual(len(copy), 105)
+        self.assertEqual(copy.count('x'), 100)
+        self.assertEqual(copy.most_common(), sketch.most_common())
+
+        # the copy is independent of the original
+        copy.add('y')
+        self.assertEqual(copy.count('y'), 6)
+        self.assertEqual(sketch.count('y'), 5)
+        self.assertEqual(len(sketch), 105)
+
+    def test_heavy_hitters(self):
+        generator = random.Random(4)
+        stream = [generator.randrange(10) if generator.random() < 0.5 else generator.randrange(10, 100000) for _ in range(50000)]
+        sketch = ApproximateMultiSet(stream, heavy_hitters=50)
+
+        # every item occurring more than len / heavy_hitters times must be tracked
+        frequent = {item for item, count in collections.Counter(stream).items() if count > len(stream) / 50}
+        self.assertTrue(frequent)
+        self.assertLessEqual(frequent, {item for item, _ in sketch.most_common()})
+
+
+class TestIntHashMap(unittest.TestCase):
+    def test_failed_store_releases_slot(self):
+        table = IntHashMap({1: 1})
+        with self.assertRaises(TypeError):
+            table[5] = 'bad'
+        with self.assertRaises(OverflowError):
+            table[6] = 2 ** 70
+
+        self.assertEqual(len(table), 1)
+        self.assertNotIn(5, table)
+        self.assertNotIn(6, table)
+
+        # a failed overwrite keeps the previous value
+        with self.assertRaises(TypeError):
+            table[1] = 'bad'
+        self.assertEqual(table[1], 1)
+
+    def test_counter_total(self):
+        counter = IntCounter([1, 1, 2, 3])
+        counter[1] = 10
+        counter[4] = 5
+        del counter[2]
+        with self.assertRaises(OverflowError):
+            counter.add(7, 2 ** 70)
+
+        self.assertNotIn(7, counter)
+        self.assertEqual(counter.total(), 16)
+        self.assertEqual(counter.total(), sum(count for _, count in counter.items()))
+
+
+if __name__ == '__main__':
+    unittest.main()
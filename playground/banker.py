@@ -1,6 +1,16 @@
 # Simulates Banker's Algorithm.
+import operator
 import random
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# the number of processes that fast_safe_state's NumPy backend checks at once; see _numpy_safe_state
+_SWEEP_BLOCK = 256
+
 
 class ResourceVector(list):
     def __init__(self, *iterable):
@@ -111,6 +121,88 @@ def rsafe_state(allocation: [[int]], max_matrix: [[int]], available: [int]) -> R
     return result if all(finish) else ResourceVector()
 
 
+def fast_safe_state(allocation: [[int]], max_matrix: [[int]], available: [int], backend='auto') -> ResourceVector:
+    """ Returns the same safe sequence as safe_state, without spinning over the processes one step at a time.
+        Like safe_state, it sweeps over the processes in index order, running each one that its need can be met,
+        until all have run; if a sweep runs none of the remaining processes, the state is unsafe, and an empty ResourceVector is returned
+        (where safe_state would never return).
+        backend selects how each sweep is computed:
+          'numpy':  finds every process that runs in the sweep with broadcast comparisons of need <= work. Requires NumPy.
+          'python': checks the remaining processes one by one, with no vector allocations.
+          'auto':   'numpy' if NumPy is installed, otherwise 'python'.
+        Allocations must be non-negative.
+    """
+    if backend not in ('auto', 'numpy', 'python'):
+        raise ValueError("backend must be 'auto', 'numpy', or 'python'; was {0}".format(backend))
+    if backend == 'numpy' and numpy is None:
+        raise ImportError("backend='numpy' requires NumPy")
+    if backend == 'numpy' or (backend == 'auto' and numpy is not None):
+        return _numpy_safe_state(allocation, max_matrix, available)
+    return _python_safe_state(allocation, max_matrix, available)
+
+
+def _python_safe_state(allocation: [[int]], max_matrix: [[int]], available: [int]) -> ResourceVector:
+    """ O(s·n·m) time for s sweeps, n processes and m resource types; typically s is much smaller than n. """
+    work = list(available)
+    need = [[m - a for m, a in zip(max_row, allocation_row)] for max_row, allocation_row in zip(max_matrix, allocation)]
+    remaining = list(range(len(need)))
+    result = ResourceVector()
+
+    while remaining:
+        still_remaining = []
+        for i in remaining:
+            if all(map(operator.le, need[i], work)):
+                work = [w + a for w, a in zip(work, allocation[i])]
+                result.append(i)
+            else:
+                still_remaining.append(i)
+        if len(still_remaining) == len(remaining):
+            return ResourceVector()
+        remaining = still_remaining
+
+    return result
+
+
+def _numpy_safe_state(allocation: [[int]], max_matrix: [[int]], available: [int]) -> ResourceVector:
+    """ A sweep runs process j if need[j] <= work + (the allocations of the processes it ran before j).
+        Each sweep goes over the remaining processes in blocks of _SWEEP_BLOCK. Within a block, the processes that run are found by iterating:
+        first those that the work at the start of the block can run; then those whose need fits in the work they would see,
+        i.e., that work plus a prefix sum of the allocations of the processes found so far; and so on, until none are added.
+        This only ever adds processes that the sweep runs, and finds all of them.
+        Each iteration is O(b·m) vectorized time for blocks of b processes, and there is one more iteration than the longest chain of processes
+        in the block that each only became runnable because of earlier ones, so a block where nothing waits on anything takes two.
+        Passing NumPy arrays rather than lists avoids converting them, which can take longer than the sweeps themselves.
+    """
+    allocation = numpy.asarray(allocation, dtype=numpy.int64)
+    need = numpy.asarray(max_matrix, dtype=numpy.int64) - allocation
+    work = numpy.asarray(available, dtype=numpy.int64)
+    remaining = numpy.arange(len(need))
+    result = ResourceVector()
+
+    while len(remaining):
+        remaining_allocation = allocation[remaining]
+        remaining_need = need[remaining]
+        runs = numpy.zeros(len(remaining), dtype=bool)
+        for start in range(0, len(remaining), _SWEEP_BLOCK):
+            block_allocation = remaining_allocation[start:start + _SWEEP_BLOCK]
+            block_need = remaining_need[start:start + _SWEEP_BLOCK]
+            block_runs = runs[start:start + _SWEEP_BLOCK]
+            found = (block_need <= work).all(axis=1)
+            while found.any():
+                block_runs |= found
+                released = block_allocation * block_runs[:, None]
+                work_before = work + numpy.cumsum(released, axis=0) - released
+                found = ~block_runs & (block_need <= work_before).all(axis=1)
+            work = work + block_allocation[block_runs].sum(axis=0)
+
+        if not runs.any():
+            return ResourceVector()
+        result.extend(remaining[runs].tolist())
+        remaining = remaining[~runs]
+
+    return result
+
+
 def is_sequence_safe(allocation: [[int]], max_matrix: [[int]], available: [int], sequence: [int]) -> bool:
     work = ResourceVector(available)
     need = calculate_need(allocation, max_matrix)
@@ -155,3 +247,46 @@ if __name__ == '__main__':
     solution_seq = [3, 0, 1, 2, 4]
     sol_safe = is_sequence_safe(allocation, max_matrix, available, solution_seq)
     print('SOLUTION SAFE?', sol_safe)
+
+    print()
+
+    # compares safe_state against fast_safe_state, on states where most processes can run right away ('independent'),
+    # and on states where most processes have to wait for others to finish first ('chained')
+    import timeit
+
+    def random_state(n_processes: int, n_resources: int, chained: bool, seed=0) -> ([[int]], [[int]], [int]):
+        """ For chained states, picks a random order for the processes to run in, and gives each a need that the work at its turn can meet. """
+        generator = random.Random(seed)
+        allocation = [[generator.randrange(10) for _ in range(n_resources)] for _ in range(n_processes)]
+        if not chained:
+            max_matrix = [[a + generator.randrange(20) for a in row] for row in allocation]
+            return allocation, max_matrix, [20] * n_resources
+
+        need = [None] * n_processes
+        work = [generator.randrange(10) for _ in range(n_resources)]
+        available = list(work)
+        order = list(range(n_processes))
+        generator.shuffle(order)
+        for i in order:
+            need[i] = [generator.randrange(w + 1) for w in work]
+            work = [w + a for w, a in zip(work, allocation[i])]
+        max_matrix = [[a + n for a, n in zip(allocation_row, need_row)] for allocation_row, need_row in zip(allocation, need)]
+        return allocation, max_matrix, available
+
+    def seconds(function: callable) -> float:
+        return min(timeit.repeat(function, number=1, repeat=3))
+
+    for n_processes, n_resources in ((1000, 16), (20000, 32)):
+        for chained in (False, True):
+            state = random_state(n_processes, n_resources, chained)
+            sequence = fast_safe_state(*state, backend='python')
+            timings = []
+            if n_processes <= 1000:
+                assert safe_state(*state) == sequence
+                timings.append('safe_state {0:.4f}s'.format(seconds(lambda: safe_state(*state))))
+            timings.append('python {0:.4f}s'.format(seconds(lambda: fast_safe_state(*state, backend='python'))))
+            if numpy is not None:
+                arrays = [numpy.asarray(matrix) for matrix in state]
+                assert fast_safe_state(*arrays, backend='numpy') == sequence
+                timings.append('numpy {0:.4f}s'.format(seconds(lambda: fast_safe_state(*arrays, backend='numpy'))))
+            print('{0} processes x {1} resources, {2}: {3}'.format(n_processes, n_resources, 'chained' if chained else 'independent', ', '.join(timings)))
@@ -0,0 +1,61 @@
+import unittest
+
+from utilities.audit import Recordable
+
+
+class TestAuditedFields(unittest.TestCase):
+    def test_missing_field_raises_attribute_error(self):
+        class Account(Recordable, audited_fields={'balance'}):
+            def __init__(self):
+                super().__init__()
+
+        account = Account()
+        self.assertEqual(getattr(account, 'balance', 'missing'), 'missing')
+        with self.assertRaises(AttributeError):
+            account.balance
+
+        account.balance = 5
+        self.assertEqual(account.balance, 5)
+        self.assertEqual(account.diff_count(), 1)
+
+    def test_subclass_with_own_setattr_of_unaudited_parent(self):
+        class Parent(Recordable, audited=False):
+            def __init__(self):
+                super().__init__()
+
+        class Child(Parent, audited=True):
+            def __setattr__(self, name, value):
+                super().__setattr__(name, value)
+
+        child = Child()
+        child.x = 1
+        child.x = 2
+        self.assertEqual(child.diff_count(), 2)
+
+        parent = Parent()
+        parent.x = 1
+        self.assertEqual(parent.diff_count(), 0)
+
+    def test_subclass_narrowing_audited_fields(self):
+        class Parent(Recordable, audited_fields={'a', 'b'}):
+            def __init__(self):
+                super().__init__()
+
+        class Child(Parent, audited_fields={'a'}):
+            pass
+
+        child = Child()
+        child.a = 1
+        child.b = 2
+        self.assertEqual(child.b, 2)
+        self.assertEqual(child.diff_count(), 1)
+        self.assertEqual([update.attribute for update in child.timeline()], ['a'])
+
+        parent = Parent()
+        parent.a = 1
+        parent.b = 2
+        self.assertEqual(parent.diff_count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()